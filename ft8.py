@@ -9,8 +9,24 @@
 # Based on protocols and algorithms from WSJT-X, Copyright (C) 2001-2019 Joe Taylor, K1JT
 # See https://physics.princeton.edu/pulsar/k1jt/wsjtx.html for further information on WSJT-X
 
+import functools
+
 import numpy as np
-import scipy.signal
+
+# scipy.fft is slow to import and is only needed to decode signals, so it is
+# imported on first use.
+# FFTW is used through pyFFTW's scipy.fft compatible interface if it is installed,
+# with its plan cache enabled so plans are reused for every period analysed.
+@functools.lru_cache(maxsize=None)
+def _scipy_fft():
+    try:
+        import pyfftw.interfaces.cache
+        import pyfftw.interfaces.scipy_fft
+    except ImportError:
+        import scipy.fft
+        return scipy.fft
+    pyfftw.interfaces.cache.enable()
+    return pyfftw.interfaces.scipy_fft
 
 tr_period = 15
 start_delay = 0.5
@@ -28,6 +44,41 @@ crc_bits = 14
 crc_padded_bits = 96
 crc_polynomial = 0x2757
 
+# The CRC is calculated a byte at a time using a lookup table.
+# Entry b in the table is the remainder after dividing b << 14 by the polynomial,
+# which is the contribution of the top 8 bits of the remainder when the next byte
+# of the padded message is shifted into the remainder.
+def _build_crc_table():
+
+    table = []
+    for b in range(256):
+        remainder = b << crc_bits
+        mask = 1 << (crc_bits + 7)
+        shifted_poly = ((1 << crc_bits) | crc_polynomial) << 7
+        for i in range(8):
+            if (remainder & mask):
+                remainder ^= shifted_poly
+            mask >>= 1
+            shifted_poly >>= 1
+        table.append(remainder)
+
+    return table
+
+crc_table = _build_crc_table()
+del _build_crc_table
+
+# The CRC is linear so the remainder of the padded message is the exclusive or of the
+# remainders of each of its bytes in their positions within the padded message.
+# crc_position_tables has a table of these remainders for each byte position.
+# The table for the last byte is the identity as a byte is smaller than the polynomial.
+# Moving a byte one position to the left multiplies its remainder by 2^8 which is
+# reduced using the single byte table.
+crc_position_tables = [list(range(256))]
+for i in range(crc_padded_bits // 8 - 1):
+    crc_position_tables.insert(0, [((r << 8) & ((1 << crc_bits) - 1)) ^ crc_table[r >> (crc_bits - 8)]
+                                   for r in crc_position_tables[0]])
+del i
+
 # LDPC generator matrix from WSJT-X lib/ft8/ldpc_174_91_c_generator.f90
 generator_hex_strings = [
     "8329ce11bf31eaf509f27fc",
@@ -117,6 +168,10 @@ generator_matrix = []
 for hex_string in generator_hex_strings:
     generator_matrix.append(int(hex_string, base=16) >> 1)
 ldpc_parity_bits = len(generator_matrix)
+
+# Generator matrix with each 91 bit row split into two 64 bit limbs, most significant first,
+# so all parity bits can be calculated at once
+generator_limbs = np.array([divmod(row, 1 << 64) for row in generator_matrix], dtype=np.uint64)
 encoded_bits = msg_bits + crc_bits + ldpc_parity_bits
 
 # LDPC parity check equations from WSJT-X lib/ft8/ldpc_174_91_c_reordered_parity.f90
@@ -296,7 +351,7 @@ bit_terms = np.array([16,  45,  73,
                41,  42,  63,
                49,  75,  83,
                20,  44,  48,
-               42,  49,  57]).reshape(encoded_bits, 3)
+               42,  49,  57], dtype=np.int32).reshape(encoded_bits, 3)
 bit_terms -= 1 # Convert from Fortran to Python indexing
 
 # We need the parity check equations in various forms.
@@ -307,35 +362,42 @@ bit_terms -= 1 # Convert from Fortran to Python indexing
 # positions that are part of the corresponding parity check equation.
 # The flat versions of bit_terms and check_terms allow numpy to
 # be used instead of Python loops in some algorithms.
+# All forms are fixed size int32 arrays. Parity check equations with
+# fewer terms than the widest equation are padded with -1.
 def _build_parity_equations():
     
-    check_terms = []
-    check_flat_terms = []
-    for i in range(ldpc_parity_bits):
-        check_terms.append([])
-        check_flat_terms.append([])
-         
-    for i, row in enumerate(bit_terms):
-        for j, t in enumerate(row):
-            check_terms[t].append(i)
-            check_flat_terms[t].append(i * 3 + j)
-    
-    bit_flat_terms = []
-    for i in range(encoded_bits):
-        bit_flat_terms.append([])
-
-    for i, row in enumerate(check_terms):
-        for j, t in enumerate(row):
-            bit_flat_terms[t].append(i * 7 + j)
-        if j == 5:
-            check_terms[i].append(-1)
-            check_flat_terms[i].append(-1)
+    # Sort the terms of bit_terms by parity check equation
+    # The sort is stable so the bits in each equation remain in ascending order
+    flat_terms = bit_terms.ravel()
+    order = np.argsort(flat_terms, kind='stable').astype(np.int32)
+    sorted_terms = flat_terms[order]
+    
+    # Find the position of each term within its parity check equation
+    check_degrees = np.bincount(flat_terms, minlength=ldpc_parity_bits).astype(np.int32)
+    check_starts = np.cumsum(check_degrees) - check_degrees
+    positions = np.arange(order.size, dtype=np.int32) - check_starts[sorted_terms]
+    
+    # Scatter the terms into the check forms of the parity check equations
+    max_check_degree = np.max(check_degrees)
+    check_terms = np.full((ldpc_parity_bits, max_check_degree), -1, dtype=np.int32)
+    check_flat_terms = np.full((ldpc_parity_bits, max_check_degree), -1, dtype=np.int32)
+    check_terms[sorted_terms, positions] = order // bit_terms.shape[1]
+    check_flat_terms[sorted_terms, positions] = order
+    
+    # Scatter the positions in the flattened check form back into the bit form
+    bit_flat_terms = np.empty(bit_terms.size, dtype=np.int32)
+    bit_flat_terms[order] = sorted_terms * max_check_degree + positions
+    bit_flat_terms = bit_flat_terms.reshape(bit_terms.shape)
  
-    return np.array(check_terms), np.array(check_flat_terms), np.array(bit_flat_terms)
+    return check_terms, check_flat_terms, bit_flat_terms
 
 check_terms, check_flat_terms, bit_flat_terms = _build_parity_equations()
 adjusted_check_terms = check_terms + 1
 adjusted_check_flat_terms = check_flat_terms + 3
+for a in (bit_terms, check_terms, check_flat_terms, bit_flat_terms,
+          adjusted_check_terms, adjusted_check_flat_terms):
+    a.setflags(write=False)
+del a
 del _build_parity_equations            
     
 encoded_bits = msg_bits + crc_bits + ldpc_parity_bits
@@ -352,6 +414,14 @@ symbol_offsets = (list(range(costas_order, costas_offsets[1])) +
                   list(range(costas_offsets[1] + costas_order, costas_offsets[2])))
 assert encoded_symbols == len(symbol_offsets)
 
+# Read only numpy versions of the above lists for use with numpy indexing
+gray_map_array = np.array(gray_map, dtype=np.uint8)
+costas_array = np.array(costas, dtype=np.uint8)
+symbol_offsets_array = np.array(symbol_offsets, dtype=np.int32)
+for a in (gray_map_array, costas_array, symbol_offsets_array):
+    a.setflags(write=False)
+del a
+
 total_symbols = encoded_symbols + costas_symbols
 
 class Callsign:
@@ -365,12 +435,26 @@ class Callsign:
     charset_456 = full_charset[0] + full_charset[11:-1]
     charsets = [charset_1, charset_2, charset_3, charset_456, charset_456, charset_456]
     
+    # Dictionaries to look up the value of a character in a character set
+    full_charset_index = {c: i for i, c in enumerate(full_charset)}
+    charset_456_index = {c: i for i, c in enumerate(charset_456)}
+    
     # Values for different types of callsigns
     max_std_calls = 1
     for charset in charsets:
         max_std_calls *= len(charset)
     max_non_std_calls = 1 << 22
     max_tokens = (1 << 28) - max_std_calls - max_non_std_calls
+    
+    # Dictionaries to look up the contribution of each character to a packed standard callsign
+    # This is the value of the character in the character set for its position multiplied
+    # by the number of combinations of characters in the following positions
+    position_values = []
+    weight = 1
+    for charset in reversed(charsets):
+        position_values.insert(0, dict(zip(charset, range(0, len(charset) * weight, weight))))
+        weight *= len(charset)
+    del weight
  
     # Tokens
     tokens = ['DE', 'QRZ', 'CQ']
@@ -394,7 +478,7 @@ class Callsign:
         
         # Check for token
         self.pack28 = Callsign._token_pack(call)
-        self.token = self.pack28 != None
+        self.token = self.pack28 is not None
         if self.token:
             self.hash = (None, None, None)
             self.standard = False
@@ -408,26 +492,18 @@ class Callsign:
         
         # Check if we have a standard callsign
         self.pack28 = Callsign._standard_pack(call)
-        self.standard = self.pack28 != None
+        self.standard = self.pack28 is not None
         
         # Check if non-standard callsign is valid
         if (not self.standard): 
             l = len(call)
             if l > 11:
                 raise ValueError('Callsign more than 10 characters long')
-            elif not all(c in Callsign.full_charset for c in call):
+            elif not all(c in Callsign.full_charset_index for c in call):
                 raise ValueError('Callsign contains invalid characters')
         
-        # At this point we have a valid callsign so calculate hash code
-        i = 0
-        for c in call.ljust(11):
-            i = i * len(Callsign.full_charset) + Callsign.full_charset.index(c)       
-        hash64 = (i * 47055833459) & (2**64 - 1)
-        
-        # Calculate hash codes of various lengths and update tables
-        hash22 = hash64 >> 42
-        hash12 = hash64 >> 52
-        hash10 = hash64 >> 54
+        # At this point we have a valid callsign so calculate hash codes and update tables
+        hash10, hash12, hash22 = Callsign._hash(call)
         self.hash = (hash10, hash12, hash22)
         Callsign.hash_table[10][hash10] = self
         Callsign.hash_table[12][hash12] = self
@@ -462,6 +538,26 @@ class Callsign:
         
         return self.standard
     
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _hash(call):
+        """Helper function to calculate callsign hash codes
+        
+        Returns a tuple of the 10, 12 and 22 bit hash codes of the callsign.
+        Results are cached as the same callsigns are seen many times.
+        """
+        
+        i = 0
+        charset_index = Callsign.full_charset_index
+        size = len(charset_index)
+        for c in call.ljust(11):
+            i = i * size + charset_index[c]
+        
+        # The hash codes are the top bits of the low 64 bits of the product
+        # Shorter hash codes are the top bits of the 22 bit hash code
+        hash22 = ((i * 47055833459) >> 42) & ((1 << 22) - 1)
+        return hash22 >> 12, hash22 >> 10, hash22
+    
     @classmethod
     def getHash(cls, code, length=22):
         """Fetch callsign corresponding to hash code of specified length"""
@@ -491,9 +587,9 @@ class Callsign:
                 c = []
                 s = len(cls.charset_456)
                 for j in range(4):
-                    c.insert(0, cls.charset_456[i % s])
+                    c.append(cls.charset_456[i % s])
                     i = i // s
-                c = "".join(c).strip()
+                c = "".join(reversed(c)).strip()
                 return Callsign('CQ ' + c)
             
             # Unknown token
@@ -513,9 +609,9 @@ class Callsign:
         c = []
         for charset in reversed(cls.charsets):
             size = len(charset)
-            c.insert(0, charset[i % size])
+            c.append(charset[i % size])
             i = i // size
-        c = ''.join(c).strip()
+        c = ''.join(reversed(c)).strip()
         
         # Handle special cases
         if c[0] == 'Q':
@@ -529,11 +625,13 @@ class Callsign:
         else:
             return Callsign(c)
         
-    @classmethod
-    def _standard_pack(cls, call):
+    @staticmethod
+    @functools.lru_cache(maxsize=8192)
+    def _standard_pack(call):
         """Helper function to pack standard callsigns
         
         Returns a 28 bit packing of the callsign if it is a standard callsign, otherwise None.
+        Results are cached as the same callsigns are seen many times.
         """
         
         # First check for some special cases that would otherwise be non-standard
@@ -561,32 +659,35 @@ class Callsign:
             l += 1
 
         # Check if callsign can be packed with standard callsign packing method
-        if l > 6 or l < 3 or not all(c in charset for charset, c in zip(cls.charsets, call)):
+        if l > 6 or l < 3:
             return None
         
-        # Perform standard callsign packing
-        i = 0
-        for charset, c in zip(cls.charsets, call.ljust(len(cls.charsets))):
-            i = i * len(charset) + charset.index(c)       
-        i = i + cls.max_tokens + (1 << 22)
+        # Perform standard callsign packing by adding up the contribution of each character
+        i = Callsign.max_tokens + (1 << 22)
+        for values, c in zip(Callsign.position_values, call.ljust(len(Callsign.position_values))):
+            if c not in values:
+                return None
+            i += values[c]
         return i
 
-    @classmethod
-    def _token_pack(cls, token):
+    @staticmethod
+    @functools.lru_cache(maxsize=8192)
+    def _token_pack(token):
         """Helper function to pack tokens
         
         Returns a 28 bit packing of the token if it is a valid token, otherwise None.
+        Results are cached as the same tokens are seen many times.
         """
         
         words = token.split()       
-        if words[0] not in cls.tokens:
+        if words[0] not in Callsign.tokens:
             return None
             
         l = len(words)
         
         # DE, QRZ, CQ
         if (l == 1):
-            return cls.tokens.index(token)
+            return Callsign.tokens.index(token)
             
         if words[0] != 'CQ' or l != 2:
             return None
@@ -596,17 +697,18 @@ class Callsign:
             v = int(words[1])
             if v < 0 or v > 999:
                 return None
-            return v + len(cls.tokens)
+            return v + len(Callsign.tokens)
         
         l = len(words[1])
-        if l > 4 or not all(c in cls.charset_456 for c in words[1]):
+        if l > 4 or not all(c in Callsign.charset_456_index for c in words[1]):
             return None
         
         # CQ aaaa
         v = 0
+        size = len(Callsign.charset_456_index)
         for c in words[1].ljust(4):
-            v = v * len(cls.charset_456) + cls.charset_456.index(c)
-        return v + len(cls.tokens) + 1000
+            v = v * size + Callsign.charset_456_index[c]
+        return v + len(Callsign.tokens) + 1000
         
 class Report:
     """Report superclass"""
@@ -620,6 +722,10 @@ class Report:
     charset_56 = "abcdefghijklmnopqrstuvwx"
     charsets = [charset_12, charset_12, charset_34, charset_34, charset_56, charset_56]
     
+    # Dictionaries to look up the value of a report or character
+    other_report_index = {r: i for i, r in enumerate(other_reports)}
+    charset_indexes = [{c: i for i, c in enumerate(charset)} for charset in charsets]
+    
     def __init__(self, value):
         self.value = value
         self.pack5 = None
@@ -641,9 +747,9 @@ class Report:
             c = []
             for charset in reversed(cls.charsets[:4]):
                 size = len(charset)
-                c.insert(0, charset[i % size])
+                c.append(charset[i % size])
                 i = i // size          
-            return LocationReport(''.join(c))
+            return LocationReport(''.join(reversed(c)))
         
         i -= cls.max_grid_4
         
@@ -660,12 +766,12 @@ class LocationReport(Report):
     def __init__(self, value):
         super().__init__(value)
         l = len(value) 
-        if not l in [4, 6] or not all(c in charset for charset, c in zip(Report.charsets, value)):
+        if not l in [4, 6] or not all(c in index for index, c in zip(Report.charset_indexes, value)):
             raise ValueError()
                 
         i = 0
-        for charset, c in zip(Report.charsets, value):
-            i = i * len(charset) + charset.index(c)
+        for index, c in zip(Report.charset_indexes, value):
+            i = i * len(index) + index[c]
         if l == 4:
             self.pack15 = i
         else:
@@ -688,9 +794,9 @@ class OtherReport(Report):
     
     def __init__(self, value):
         super().__init__(value)
-        if not value in Report.other_reports:
+        if not value in Report.other_report_index:
             raise ValueError()                
-        self.pack15 = Report.max_grid_4 + Report.other_reports.index(value) + 1
+        self.pack15 = Report.max_grid_4 + Report.other_report_index[value] + 1
         
 class SerialReport(Report):
     """Serial number report"""
@@ -728,14 +834,19 @@ class RTTYState:
               "NB", "NS", "QC", "ON", "MB", "SK", "AB", "BC", "NWT", "NF",
               "LB", "NU", "YT", "PEI", "DC"]
     
+    state_index = {s: i for i, s in enumerate(states)}
+    
     state_offset = 8001
     
     def __init__(self, value):
+        # Serial numbers may be given as integers or strings of digits
+        if isinstance(value, str) and value.isnumeric():
+            value = int(value)
         self.value = value
-        if value.isnumeric() and value < self.state_offset:
+        if isinstance(value, int) and value < self.state_offset:
             self.pack13 = value
-        elif value in self.states:
-            self.pack13 = self.state_offset + self.states.index(value)
+        elif value in self.state_index:
+            self.pack13 = self.state_offset + self.state_index[value]
         else:
             raise ValueError()
             
@@ -749,8 +860,10 @@ class RTTYState:
     def unpack13(cls, bits):
         if bits < cls.state_offset:
             return cls(bits)
-        else:
+        elif bits - cls.state_offset < len(cls.states):
             return cls(cls.states[bits - cls.state_offset])
+        else:
+            raise ValueError()
     
 class Message:
     
@@ -766,6 +879,33 @@ class Message:
     def __eq__(self, other):
         return str(self) == str(other)
     
+    @staticmethod
+    def _field_layout(field_widths):
+        """Helper function to calculate the shift and mask of each field of a packed message"""
+        
+        # The first field is the most significant
+        layout = []
+        shift = 0
+        for w in reversed(field_widths):
+            layout.insert(0, (shift, (1 << w) - 1))
+            shift += w
+        return layout
+    
+    @classmethod
+    def _pack_fields(cls, field_bits):
+        """Helper function to pack fields into a message using the field layout of the class"""
+        
+        pack77 = 0
+        for (shift, _), f in zip(cls.field_layout, field_bits):
+            pack77 |= int(f) << shift
+        return pack77
+    
+    @classmethod
+    def _unpack_fields(cls, bits):
+        """Helper function to unpack fields from a message using the field layout of the class"""
+        
+        return [(bits >> shift) & mask for shift, mask in cls.field_layout]
+    
     @staticmethod
     def _crc(msg, chk):
         """Calculate FT8 CRC."""
@@ -778,54 +918,59 @@ class Message:
         # Pad msg with 96-77 = 19 zeros to create 96 bit number and add checksum
         # Padding must be at least CRC size bits for the CRC algorithm to work
         # FT8 designers rounded up padding to make the padded message a whole number of bytes
-        remainder = (msg << (crc_padded_bits - msg_bits)) | chk
-    
-        # Mask starts at most significant bit
-        mask = 1 << (crc_padded_bits - 1)
-    
-        # Align most significant bit of polynomial with mask
-        # Note that the specified polynomial does not include the most significant bit
-        # So we must add the most significant bit before we align the polynomial
-        shifted_poly = ((1 << crc_bits) | crc_polynomial) << (crc_padded_bits - crc_bits - 1)
-    
-        # Polynomial long division modulo 2
+        padded_msg = (msg << (crc_padded_bits - msg_bits)) | chk
+
+        # Polynomial long division modulo 2 performed a byte at a time
         # We are only interested in the remainder so we don't bother calculating the quotient
-        for i in range(crc_padded_bits - crc_bits):
-            if (remainder & mask):
-                remainder ^= shifted_poly
-            mask >>= 1
-            shifted_poly >>= 1
-            
-        return remainder      
+        # The remainder for each byte is looked up independently of the other bytes
+        remainder = 0
+        for table, byte in zip(crc_position_tables, padded_msg.to_bytes(crc_padded_bits // 8, 'big')):
+            remainder ^= table[byte]
 
-    def encode(self):
-        """Encode message into 79 symbols."""
-        
-        # Symbols are returned in a Python list of integers
-        # Applies CRC, LDPC, Gray codes and adds Costas arrays
+        return remainder
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _codeword(msg):
+        """Calculate FT8 LDPC codeword."""
+
+        # msg is the 77 bit message stored in a Python 3 integer
+        # Returns the 174 bit codeword in a read only numpy array with one bit per element
+        # Results are cached as the same message is often encoded many times
 
         # Calculate 14-bit CRC and append to the packed message to get
         # 77 + 14 = 91 bit packed message with CRC
-        msg_crc = self.pack77 << 14 | Message._crc(self.pack77, 0)
+        msg_crc = msg << crc_bits | Message._crc(msg, 0)
 
         # Generate 83 bits of parity by multiplying generator matrix by message bits.
         # We use the logical AND operator to perform modulo 2 multiplication.
         # We then count the set bits to find the sum modulo 2.
-        # While this is concise it is probably not that efficient
-        parity = 0
-        for row in generator_matrix:
-            parity = parity << 1
-            parity = parity | (bin(row & msg_crc).count('1') % 2)
-    
+        if hasattr(np, 'bitwise_count'):
+            # Process all rows of the generator matrix at once using the same 64 bit limbs
+            msg_limbs = np.array(divmod(msg_crc, 1 << 64), dtype=np.uint64)
+            parity = (np.sum(np.bitwise_count(generator_limbs & msg_limbs), axis=1) & 1).astype(np.uint8)
+        else:
+            # Older versions of numpy cannot count bits so process one row at a time
+            parity = np.array([(row & msg_crc).bit_count() & 1 for row in generator_matrix], dtype=np.uint8)
+
         # Construct 174 bit codeword by combining 91 bit message and 83 bits of parity
-        codeword = (msg_crc << 83) | parity
+        msg_crc_bytes = np.frombuffer(msg_crc.to_bytes(crc_padded_bits // 8, 'big'), dtype=np.uint8)
+        msg_crc_bits = np.unpackbits(msg_crc_bytes)[-(msg_bits + crc_bits):]
+        codeword = np.concatenate((msg_crc_bits, parity))
+        codeword.setflags(write=False)
+        return codeword
+
+    def encode(self):
+        """Encode message into 79 symbols."""
+        
+        # Symbols are returned in a Python list of integers
+        # Applies CRC, LDPC, Gray codes and adds Costas arrays
+
+        # Calculate the 174 bit codeword containing the message, CRC and parity bits
+        bits = Message._codeword(self.pack77)
 
         # Split 174 bit codeword into 58 x 3 bit symbols and apply gray code
-        msg_symbols = []
-        mask = (1 << 3) - 1
-        for i in range(174 // 3):
-            msg_symbols.insert(0, gray_map[codeword & mask])
-            codeword = codeword >> 3
+        msg_symbols = gray_map_array[np.dot(bits.reshape(encoded_symbols, tone_order), [4, 2, 1])].tolist()
 
         # Add 3 x 7 symbol Costas arrays to the 58 symbol encoded message to get 79 symbols
         symbols = costas + msg_symbols[:encoded_symbols // 2] + costas + msg_symbols[encoded_symbols // 2:] + costas
@@ -868,6 +1013,7 @@ class TextMessage(Message):
     # Text messages use a limited character set
     charset = ' 0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ+=./?'
     charset_size = len(charset)
+    charset_index = {c: i for i, c in enumerate(charset)}
     msg_type = 0
     msg_subtype = 0
     
@@ -877,13 +1023,14 @@ class TextMessage(Message):
     def __init__(self, text):
         self.text = text.strip()
 
-        if len(text) > TextMessage.max_msg_size or not all(c in TextMessage.charset for c in text):
+        charset_index = TextMessage.charset_index
+        if len(text) > TextMessage.max_msg_size or not all(c in charset_index for c in text):
             raise ValueError()
        
         i = 0
+        size = TextMessage.charset_size
         for c in self.text:
-            i *= TextMessage.charset_size
-            i += TextMessage.charset.index(c)
+            i = i * size + charset_index[c]
         self.pack77 = (i << 6) | (TextMessage.msg_subtype << 3) | TextMessage.msg_type
         
     def __str__(self):
@@ -896,9 +1043,9 @@ class TextMessage(Message):
         i = bits >> 6
         c = []
         for j in range(cls.max_msg_size):
-            c.insert(0, cls.charset[i % cls.charset_size])
+            c.append(cls.charset[i % cls.charset_size])
             i = i // cls.charset_size
-        return cls(''.join(c).strip())
+        return cls(''.join(reversed(c)).strip())
     
 class TelemetryMessage(Message):
     """A class to represent telemetry messages"""
@@ -928,8 +1075,11 @@ class StandardMessage(Message):
     #         1 bit for roger, 15 bits for a report and 3 bits for message type
     msg_type = 1
     field_widths = [28, 1, 28, 1, 1, 15, 3]
+    field_layout = Message._field_layout(field_widths)
    
     def __init__(self, call_1, call_2, report, roger=False, rover_1=False, rover_2=False):
+        if not isinstance(call_1, Callsign) or not isinstance(call_2, Callsign) or not isinstance(report, Report):
+            raise ValueError()
         self.call_1 = call_1
         self.rover_1 = rover_1
         self.call_2 = call_2
@@ -939,9 +1089,7 @@ class StandardMessage(Message):
         self.fields = [self.call_1, self.rover_1, self.call_2, self.rover_2, self.roger, self.report]
         field_bits = [call_1.pack28, rover_1, call_2.pack28, rover_2, roger,
                       report.pack15, self.msg_type]
-        self.pack77 = 0
-        for w, f in zip(self.field_widths, field_bits):
-            self.pack77 = (self.pack77 << w) | int(f)
+        self.pack77 = self._pack_fields(field_bits)
         return
     
     def __str__(self):
@@ -966,10 +1114,7 @@ class StandardMessage(Message):
     def unpack77(cls, bits):
         """Unpack standard message from bits"""
         
-        f = []
-        for w in reversed(cls.field_widths):
-            f.insert(0, bits & ((1 << w) - 1))
-            bits >>= w
+        f = cls._unpack_fields(bits)
         return cls(Callsign.unpack28(f[0]), Callsign.unpack28(f[2]), Report.unpack15(f[5]), 
                    f[4] != 0, f[1] != 0, f[3] != 0)
     
@@ -986,6 +1131,7 @@ class RTTYMessage(Message):
 
     msg_type = 3
     field_widths = [1, 28, 28, 1, 3, 13, 3]
+    field_layout = Message._field_layout(field_widths)
 
     def __init__(self, call_1, call_2, roger, signal, state, thank_you=False):
         if not isinstance(call_1, Callsign):
@@ -1013,9 +1159,7 @@ class RTTYMessage(Message):
         self.thank_you = thank_you
         
         field_bits = [thank_you, call_1.pack28, call_2.pack28, roger, signal.pack3, state.pack13, self.msg_type]
-        self.pack77 = 0
-        for w, f in zip(self.field_widths, field_bits):
-            self.pack77 = (self.pack77 << w) | int(f)
+        self.pack77 = self._pack_fields(field_bits)
         return
     
     def __str__(self):
@@ -1033,13 +1177,14 @@ class RTTYMessage(Message):
     @classmethod
     def unpack77(cls, bits):
         
-        f = []
-        for w in reversed(cls.field_widths):
-            f.insert(0, bits & ((1 << w) - 1))
-            bits >>= w
+        f = cls._unpack_fields(bits)
         return cls(Callsign.unpack28(f[1]), Callsign.unpack28(f[2]), f[3] != 0, RTTYSignal.unpack3(f[4]), 
                    RTTYState.unpack13(f[5]), f[0] != 0)
 
+# Squared magnitude of complex values without the square root needed by np.abs
+def _sq_mag(x):
+    return x.real * x.real + x.imag * x.imag
+
 class Candidate:
     """A simple class for holding candidate signal information."""
     
@@ -1078,6 +1223,9 @@ class SpectralAnalysis:
         if (sample_rate != 12000):
             raise ValueError()
         self.sample_rate = sample_rate
+        
+        # Single precision is plenty for the spectral analysis and halves the memory traffic
+        samples = np.asarray(samples, dtype=np.float32)
         self.samples = samples
         self.spectrogram = SpectralAnalysis._calculate_spectrogram(samples, sample_rate)
         self.baseline = SpectralAnalysis._calculate_baseline(self.spectrogram)
@@ -1088,7 +1236,9 @@ class SpectralAnalysis:
     def noise_baseline(self, freq):
         """Get noise PSD for a frequency or array of frequencies."""
         
-        index = np.rint((freq - self.low_frequency) / freq_shift * self.spectrogram_bins_per_tone).astype(np.int)
+        # Frequencies corrected just past either end of the baseline use the nearest end
+        index = np.rint((freq - self.low_frequency) / freq_shift * self.spectrogram_bins_per_tone).astype(int)
+        index = np.clip(index, 0, self.baseline.size - 1)
         psd = np.power(10.0, 0.1 * self.baseline[index])
         return psd
     
@@ -1098,11 +1248,20 @@ class SpectralAnalysis:
         
         samples_per_symbol = int(sample_rate / freq_shift)
         dft_length = samples_per_symbol * SpectralAnalysis.spectrogram_bins_per_tone
-        overlap_samples = samples_per_symbol - samples_per_symbol // SpectralAnalysis.spectrogram_steps_per_symbol
+        step_samples = samples_per_symbol // SpectralAnalysis.spectrogram_steps_per_symbol
   
-        f, t, s = scipy.signal.spectrogram(samples, sample_rate, 'boxcar', samples_per_symbol, overlap_samples, dft_length, False, True)
+        # Compute the DFT of each overlapping segment of samples so the result is indexed by time then frequency
+        segments = np.lib.stride_tricks.sliding_window_view(samples, samples_per_symbol)[::step_samples]
+        dft = _scipy_fft().rfft(segments, dft_length, axis=1, workers=-1)
+        
+        # Convert to a one sided power spectral density with the same scaling as scipy.signal.spectrogram
+        s = _sq_mag(dft)
+        s *= 2.0 / (sample_rate * samples_per_symbol)
+        s[:, 0] /= 2.0
+        if dft_length % 2 == 0:
+            s[:, -1] /= 2.0
        
-        return np.transpose(s)
+        return s
     
     @staticmethod
     def _calculate_baseline(spectrogram):
@@ -1114,20 +1273,26 @@ class SpectralAnalysis:
         high_freq_index = int(SpectralAnalysis.high_frequency / freq_shift * SpectralAnalysis.spectrogram_bins_per_tone)
         db = 10.0 * np.log10(np.mean(spectrogram[:, low_freq_index : high_freq_index], axis=0))
         
-        # Divide the PSD into 10 segments
+        # Divide the PSD into 10 segments split like np.array_split
+        # The first few segments may be one longer than the rest, so the long and short segments
+        # are each laid out as the rows of a matrix
         indexes = np.arange(high_freq_index - low_freq_index)
-        segments = np.array_split(indexes, 10)
+        length, long_segments = divmod(indexes.size, 10)
+        split = long_segments * (length + 1)
+        blocks = [indexes[:split].reshape(long_segments, length + 1), indexes[split:].reshape(10 - long_segments, length)]
         
         # Find indexes and values where PSD is less than 10th percentile in corresponding segment
         base_indexes = []
         base_values = []
-        for segment in segments:
-            segment_values = db[segment] # Get values for this segment
-            base = np.percentile(segment_values, 10) # Find 10th percentile
-            selector = segment_values <= base # Find where less than 10th percentile
+        for block in blocks:
+            if block.size == 0:
+                continue
+            block_values = db[block] # Get values for these segments
+            base = np.percentile(block_values, 10, axis=1) # Find 10th percentile of each segment
+            selector = block_values <= base[:, np.newaxis] # Find where less than 10th percentile
             
-            base_indexes.append(segment[selector]) # Get indexes where less than 10th percentile
-            base_values.append(segment_values[selector]) # Get values where less than 10th percentile
+            base_indexes.append(block[selector]) # Get indexes where less than 10th percentile
+            base_values.append(block_values[selector]) # Get values where less than 10th percentile
         
         base_index = np.concatenate(base_indexes) # Combine indexes where less than 10th percentile
         base_value = np.concatenate(base_values) # Combine values where less than 10th percentile
@@ -1147,10 +1312,11 @@ class SpectralAnalysis:
         """Utility function to calculate the complex spectrum."""
         
         # Choose DFT length to get our desired frequency domain resolution
+        # For 12000 samples/s this is 192000 = 2**9 * 3 * 5**3 which is already a fast FFT length
         dft_length = (tr_period + 1) * sample_rate
         
         # Compute the DFT using the FFT algorithm
-        complex_spectrum = np.fft.rfft(samples, dft_length)
+        complex_spectrum = _scipy_fft().rfft(samples, dft_length, workers=-1)
         
         return complex_spectrum  
 
@@ -1159,52 +1325,61 @@ class SpectralAnalysis:
         """Cross-correlation of Costas arrays with a spectrogram."""
         
         # Based on code from WSJT-X lib/ft8/sync8.f90
-        # Loops have been reordered to push most of the work into scipy.correlate
+        # Loops have been reordered to correlate all three Costas arrays in a single pass
 
         symbol_step = SpectralAnalysis.spectrogram_steps_per_symbol
         tone_step = SpectralAnalysis.spectrogram_bins_per_tone
         
-        # Build signal correlation matrix from Costas array
-        t_matrix = np.zeros((costas_order * symbol_step, costas_order * tone_step))
-        for symbol, tone in enumerate(costas):
-            t_matrix[symbol * symbol_step, tone * tone_step] = 1.0
-    
-        # Build signal + noise correlation matrix
-        t0_matrix = np.zeros(t_matrix.shape)
-        t0_matrix[::symbol_step, ::tone_step] = 1.0
+        # Size of the correlation matrices built from the Costas array
+        # The signal matrix has a 1 at each symbol and tone of the Costas array and the
+        # signal + noise matrix has a 1 at each symbol and every tone
+        matrix_rows = costas_order * symbol_step
+        matrix_columns = costas_order * tone_step
     
         # Limit our search to a subset of frequencies
         low_freq_index = int(SpectralAnalysis.low_frequency / freq_shift * tone_step)
         high_freq_index = int(SpectralAnalysis.high_frequency / freq_shift * tone_step)
-        high_freq_index += t_matrix.shape[1] - 1
+        high_freq_index += matrix_columns - 1
         freq_slice = slice(low_freq_index, high_freq_index)
         
         # Limit our search to a subset of time offsets
         low_time_index = int((start_delay - SpectralAnalysis.offset_bound) * baud_rate * symbol_step)
         high_time_index = int((start_delay + SpectralAnalysis.offset_bound) * baud_rate * symbol_step)
         time_steps = high_time_index - low_time_index
-        high_time_index += t_matrix.shape[0] - 1
+        high_time_index += matrix_rows - 1
    
-        # Correlate signal and signal + noise for each of the three Costas array offsets
+        # Take the time range covering all three Costas array offsets
+        low = max(0, low_time_index)
+        high = min(spectrogram.shape[0], high_time_index + costas_offsets[-1] * symbol_step)
+        segment = spectrogram[low:high, freq_slice]
+        rows = segment.shape[0] - matrix_rows + 1
+        columns = segment.shape[1] - matrix_columns + 1
+        
+        # The correlation matrices are sparse so correlate by adding up shifted slices of the spectrogram
+        # Signal + noise is done in two steps, adding up the tones then adding up the symbols
+        t_all = np.zeros((rows, columns))
+        for symbol, tone in enumerate(costas):
+            t_all += segment[symbol * symbol_step: symbol * symbol_step + rows, tone * tone_step: tone * tone_step + columns]
+        tone_sum = np.zeros((segment.shape[0], columns))
+        for tone in range(costas_order):
+            tone_sum += segment[:, tone * tone_step: tone * tone_step + columns]
+        t0_all = np.zeros((rows, columns))
+        for symbol in range(costas_order):
+            t0_all += tone_sum[symbol * symbol_step: symbol * symbol_step + rows]
+        
+        # Pad correlation results with zeros where the time range was truncated by the spectrogram
+        pad_before = low - low_time_index
+        pad_after = costas_offsets[-1] * symbol_step + time_steps - pad_before - rows
+        t_all = np.pad(t_all, ((pad_before, pad_after), (0, 0)), mode='constant')
+        t0_all = np.pad(t0_all, ((pad_before, pad_after), (0, 0)), mode='constant')
+        
+        # Extract the signal and signal + noise correlations for each of the three Costas array offsets
         t = [] # List of signal correlations
         t0 = [] # List of signal + noise correlations
-        for offset in costas_offsets:       
-            # Adjust time range to search for Costas array at this offset
-            low = max(0, low_time_index + offset * symbol_step)
-            high = min(spectrogram.shape[0], high_time_index + offset * symbol_step)
-            time_slice = slice(low, high)
-        
-            # Do correlations for signal and signal + noise for Costas array at this offset
-            t.append(scipy.signal.correlate(spectrogram[time_slice, freq_slice], t_matrix, mode='valid'))
-            t0.append(scipy.signal.correlate(spectrogram[time_slice, freq_slice], t0_matrix, mode='valid'))   
-
-        # Pad first and last correlation results as they might be truncated in time
-        time_pad = time_steps - t[0].shape[0]
-        t[0] = np.pad(t[0], ((time_pad, 0), (0, 0)), mode='constant')
-        t0[0] = np.pad(t0[0], ((time_pad, 0), (0, 0)), mode='constant')
-        time_pad = time_steps - t[-1].shape[0]
-        t[-1] = np.pad(t[-1], ((0, time_pad), (0, 0)), mode='constant')
-        t0[-1] = np.pad(t0[-1], ((0, time_pad), (0, 0)), mode='constant')
+        for offset in costas_offsets:
+            time_slice = slice(offset * symbol_step, offset * symbol_step + time_steps)
+            t.append(t_all[time_slice])
+            t0.append(t0_all[time_slice])
 
         # Calculate signal to noise ratio excluding 1st Costas array
         t_sum = t[1] + t[2]
@@ -1242,7 +1417,12 @@ class SpectralAnalysis:
         
         # Eliminate candidates that are next to a stronger candidate
         # Note that WSJT-X does this a little differently
-        duplicates = np.amax(np.tril(np.abs(candidate_bins - candidate_bins[np.newaxis].T) == 1), axis=0)
+        # Candidates are in order of increasing SNR so look up the rank of the candidate (if any)
+        # in the bins either side of each candidate, with -1 for bins without a candidate
+        ranks = np.arange(candidate_bins.size)
+        bin_ranks = np.full(snr_matrix.shape[1] + 2, -1) # Padded so every candidate has two neighbours
+        bin_ranks[candidate_bins + 1] = ranks
+        duplicates = (bin_ranks[candidate_bins] > ranks) | (bin_ranks[candidate_bins + 2] > ranks)
         candidate_bins = candidate_bins[np.logical_not(duplicates)]
         
         # Reorder by frequency
@@ -1262,16 +1442,12 @@ class FSK:
         # Generate a baseband MFSK reference signal suitable for cross-correlation
         # Assumes baud rate (samples_rate / samples_per_symbol) = tone separation
         # Locates lowest tone corresponding to symbol value 0 at 0 Hz
-        signal = np.empty((len(symbols), samples_per_symbol), dtype=np.complex128)
-        phi = 0.0
-        for i, symbol in enumerate(symbols):
-            delta_phi = np.pi * 2.0 * symbol / samples_per_symbol
-            for k in range(samples_per_symbol):
-                phi += delta_phi
-                phi %= np.pi * 2.0
-                signal[i, k] = np.cos(phi) + 1.0j * np.sin(phi)
-
-        self.signal = np.reshape(signal, len(symbols) * samples_per_symbol)
+        # A 2D array of symbols generates one signal for each row
+        # The phase is accumulated in double precision so it does not drift over the whole signal
+        delta_phi = np.repeat(np.asarray(symbols, dtype=np.float64) * (np.pi * 2.0 / samples_per_symbol),
+                              samples_per_symbol, axis=-1)
+        phi = np.cumsum(delta_phi, axis=-1) % (np.pi * 2.0)
+        self.signal = np.exp(1.0j * phi).astype(np.complex64)
     
 class Signal:
     """A class for performing analysis of candidate FT8 signals."""
@@ -1281,35 +1457,39 @@ class Signal:
     samples_per_symbol = int(sample_rate / baud_rate)
     demap_max_symbols = 3
     decoder_max_iterations = 200
+    decoder_damping = 1.0 # Weight of new check node messages, less than 1 damps the sum product decoder
+    decoder_stall_iterations = 20 # Give up when the bit LLRs have not become more reliable for this many iterations
+    min_sum_scale = 0.75 # Scale factor applied to check node messages by the min-sum decoder
+    detect_min_snr = -26.0 # Candidates weaker than this are not decoded
      
     # Precalculate signals used to refine frequency estimate and correct for the revised estimate
     freq_step = 0.5
     correction_bound = 5
     symbol_correction_range = np.arange(-correction_bound, correction_bound + 1) * freq_step / freq_shift
-    costas_conjugates = np.empty((len(symbol_correction_range), samples_per_symbol * costas_order), dtype=np.complex128)
-    correction_signals = np.empty((len(symbol_correction_range), samples_per_symbol * total_symbols), dtype=np.complex128)
-        
-    for i, correction in enumerate(symbol_correction_range):
-        symbols = np.array(costas) + correction
-        costas_conjugates[i] = np.conjugate(FSK(symbols, sample_rate, samples_per_symbol).signal)
-        symbols = np.full(total_symbols, -correction)
-        correction_signals[i] = FSK(symbols, sample_rate, samples_per_symbol).signal
-
-    del symbols
-    del i
-    del correction
-    
-    # Precalculate arrays used by demapper to select permutations that have a specific bit set
-    demap_max_bits = demap_max_symbols * tone_order
-    demap_max_permutations = 1 << demap_max_bits
-    demap_one = np.zeros((demap_max_bits, demap_max_permutations), dtype='bool')
-    for i in range(demap_max_bits):
-        for j in range(demap_max_permutations):
-            if j & 1 << i:
-                demap_one[i, j] = True
-    demap_not_one = np.logical_not(demap_one)
-    del i
-    del j
+    costas_conjugates = np.conjugate(FSK(costas_array + symbol_correction_range[:, np.newaxis],
+                                         sample_rate, samples_per_symbol).signal)
+    correction_signals = FSK(np.repeat(-symbol_correction_range[:, np.newaxis], total_symbols, axis=1),
+                             sample_rate, samples_per_symbol).signal
+    
+    # Precalculate indexes of the baseband samples correlated with each Costas array
+    costas_sample_indexes = (np.array(costas_offsets)[:, np.newaxis] +
+                             np.arange(costas_order * samples_per_symbol))
+    
+    # Precalculate the tone of each symbol in a symbol group for every permutation of the bits
+    # in the group, one table for each number of extra symbols in a group
+    # The most significant bits of a permutation index correspond with the first symbol in the group
+    # Also precalculate the observation rows of the symbols in each symbol group so every
+    # demapping attempt in the retry loop reuses the same layout
+    perm_tones = []
+    group_rows = []
+    for num_symbols in range(demap_max_symbols):
+        permutations = np.arange(1 << (num_symbols + 1) * tone_order)
+        shifts = np.arange(num_symbols, -1, -1) * tone_order
+        perm_tones.append(gray_map_array[permutations[:, np.newaxis] >> shifts & (tone_count - 1)])
+        group_rows.append(symbol_offsets_array[::num_symbols + 1, np.newaxis] + np.arange(num_symbols + 1))
+    del num_symbols
+    del permutations
+    del shifts
 
     def __init__(self, candidate, analysis):
         self.spectrum, self.freq, self.offset, self.baseband, self.sync = Signal._refine_estimates(candidate, analysis)
@@ -1318,6 +1498,50 @@ class Signal:
     def __str__(self):
         return "{:4.1f} {:4.1f} {:4.0f} {}".format(self.snr, self.offset, self.freq, self.msg)
     
+    @staticmethod
+    def decode_batch(candidates, analysis):
+        """Decode a list of candidates together.
+        
+        Returns a list of Signal objects for the candidates that were decoded, in candidate order.
+        This gives the same signals as creating a Signal for each candidate but is faster as the
+        decoders work on all the candidates at once.
+        """
+        
+        # Refine the estimates of every candidate, then detect the messages of all of them together
+        # Signals are only created for the candidates that were decoded
+        estimates = [Signal._refine_estimates(candidate, analysis) for candidate in candidates]
+        detections = Signal._detect_batch([e[3] for e in estimates], [e[1] for e in estimates], analysis)
+        return [Signal._from_detection(e, d) for e, d in zip(estimates, detections) if d is not None]
+    
+    @classmethod
+    def _from_detection(cls, estimates, detection):
+        """Create a signal from refined estimates and a detected message, as made by decode_batch."""
+        
+        signal = cls.__new__(cls)
+        signal.spectrum, signal.freq, signal.offset, signal.baseband, signal.sync = estimates
+        signal.msg, signal.snr, signal.obs, signal.llr, signal.codeword = detection
+        return signal
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=16)
+    def _tukey_window(bin_range):
+        """Tukey window used to extract a candidate signal from the spectrum."""
+        
+        # Only a couple of different window lengths occur so they are cached
+        # Calculated the same way as scipy.signal.windows.tukey, which takes much longer to import than
+        # the rest of the decoder takes to warm up
+        alpha = 1/5 # Central 4/5th is wide enough for 8 tones
+        n = np.arange(bin_range)
+        width = int(np.floor(alpha * (bin_range - 1) / 2.0))
+        window = np.ones(bin_range)
+        n1 = n[:width + 1]
+        n3 = n[bin_range - width - 1:]
+        window[:width + 1] = 0.5 * (1 + np.cos(np.pi * (-1 + 2.0 * n1 / alpha / (bin_range - 1))))
+        window[bin_range - width - 1:] = 0.5 * (1 + np.cos(np.pi * (-2.0 / alpha + 1 + 2.0 * n3 / alpha / (bin_range - 1))))
+        window = window.astype(np.float32)
+        window.setflags(write=False)
+        return window
+
     @staticmethod
     def _extract_baseband(candidate, analysis):
         """Extract and downconvert a single candiate FT8 signal."""
@@ -1334,17 +1558,22 @@ class Signal:
         padded_bin_range = int(Signal.sample_rate / bin_width) # Number of bins needed to get desired baseband
    
         # Extract the candidate FT8 signal from the spectrum, apply Tukey window, down convert to baseband
+        # Bins are placed directly at their position after a circular shift that moves the lowest tone
+        # down to zero frequency, wrapping the bins below the lowest tone around to the end
         s = np.zeros(padded_bin_range, dtype=analysis.complex_spectrum.dtype) # Output spectrum
-        window = scipy.signal.windows.tukey(bin_range, 1/5) # Central 4/5th is wide enough for 8 tones
-        s[0: bin_range] = analysis.complex_spectrum[lower_bin : upper_bin + 1] * window  
-        s = np.roll(s, lower_bin - start_bin) # Shift lowest tone down to zero frequency
+        window = Signal._tukey_window(bin_range)
+        spectrum = analysis.complex_spectrum[lower_bin : upper_bin + 1]
+        shift = (lower_bin - start_bin) % padded_bin_range # Position of lower_bin after the shift
+        split = min(bin_range, padded_bin_range - shift) # Number of bins placed before wrapping around
+        np.multiply(spectrum[:split], window[:split], out=s[shift: shift + split])
+        np.multiply(spectrum[split:], window[split:], out=s[0: bin_range - split])
         
         # Calculate scale factor
         scale = 1.0 / np.sqrt((analysis.complex_spectrum.size - 1) * 2 * s.size)
 
         # Calculate inverse fft (complex to complex)
         #return s, np.fft.ifft(s) * scale
-        return s, np.fft.ifft(s) / 32
+        return s, _scipy_fft().ifft(s) / 32
  
     @staticmethod
     def _correlate(baseband, costas_conjugate):
@@ -1353,11 +1582,10 @@ class Signal:
         # Based on code from WSJT-X lib/ft8/sync8d.f90
         # Loops have been reordered to exploit numpy
         
-        t = 0.0       
-        for offset in costas_offsets:
-            p = baseband[offset: offset + costas_order * Signal.samples_per_symbol] * costas_conjugate
-            s = np.sum(np.reshape(p, (costas_order, Signal.samples_per_symbol)), axis=1)
-            t += np.sum(np.abs(s) ** 2)
+        # Correlate all of the Costas arrays at once using a table of sample indexes
+        p = baseband[Signal.costas_sample_indexes] * costas_conjugate
+        s = np.sum(np.reshape(p, (len(costas_offsets), costas_order, Signal.samples_per_symbol)), axis=2)
+        t = np.sum(_sq_mag(s))
                                                         
         return t
 
@@ -1425,16 +1653,15 @@ class Signal:
         # Based on code from WSJT-X lib/ft8/ft8b.f90
         
         # Demodulate baseband by computing 79 DFTs, one for each symbol period
-        f, t, dft = scipy.signal.stft(baseband, fs=200, window='boxcar', nperseg=32, noverlap=0,
-                                       boundary=None, return_onesided=False, axis=1)
-        #dft = dft[:, :tone_count] * 32 * 32 # We are only interested in the lowest M bins
-        dft = dft[:, :tone_count]
+        # We are only interested in the lowest M bins, scaled by the DFT length like scipy.signal.stft
+        symbols = np.reshape(baseband, (total_symbols, Signal.samples_per_symbol))
+        dft = _scipy_fft().fft(symbols, axis=1)[:, :tone_count] / Signal.samples_per_symbol
 
         # Hard detection of Costas arrays
-        tones = np.argmax(np.abs(dft), axis=1)
+        tones = np.argmax(_sq_mag(dft), axis=1)
         good_tones = 0
         for offset in costas_offsets:
-            good_tones += np.sum(tones[offset: offset+costas_order] == costas) 
+            good_tones += np.sum(tones[offset: offset+costas_order] == costas_array)
       
         # Sanity check
         if good_tones <= 6:
@@ -1448,38 +1675,33 @@ class Signal:
         
         # Based on code from WSJT-X lib/ft8/ft8b.f90
                
-        llr = np.empty(encoded_bits) # Storage for Log likelyhood ratios              
-        mask = (1 << tone_order) - 1
         num_bits = (num_symbols + 1) * tone_order # Number of bits in a symbol group
-        num_permutations = 1 << num_bits # Number of permutations of the bits in a symbol group
-        
-        # Loop through groups of num_symbol symbols at a time
-        for i in range(0, encoded_symbols, num_symbols + 1):
-                
-            # Sum DFT filter outputs corresponding to all permutations of bits in a symbol group
-            s = np.zeros(num_permutations, dtype='complex128')
-            for p in range(num_permutations):
-                
-                # Add up contributions from each symbol in the symbol group for this permutation
-                t = p
-                for j in range(num_symbols, -1, -1):
-                    tone = gray_map[t & mask] # Tone that corresponds to this permutation for this symbol
-                    s[p] += obs[symbol_offsets[i] + j, tone] #
-                    t >>= tone_order # Prepare for next iteration
-            
-            # Calculate magnitude of all the sums
-            m = np.abs(s)
-            
-            # Loop through all the bits of the codeword that correspond to this group of symbols
-            first_bit = i * tone_order
-            last_bit = min(first_bit + num_bits, encoded_bits)
-            bit_pos = num_bits - 1 # Most significant bit of the permutations index corresponds with first_bit
-            for encoded_bit in range(first_bit, last_bit):               
-                # Find maximum magnitude of permutations where this bit position is a 1 and subtract maximum
-                # magnitude of permutations where this bit position is a 0
-                llr[encoded_bit] = (np.amax(m[Signal.demap_one[bit_pos, :num_permutations]]) -
-                                    np.amax(m[Signal.demap_not_one[bit_pos, :num_permutations]]))
-                bit_pos -= 1 # next bit will be less significant than this bit
+        rows = Signal.group_rows[num_symbols] # Observation rows of the symbols in each group
+        tones = Signal.perm_tones[num_symbols] # Tones for each permutation of each symbol in a group
+        
+        # Sum DFT filter outputs corresponding to all permutations of bits in every symbol group at once
+        # Adding one symbol of the groups at a time avoids a large intermediate array
+        # The order of the additions differs from the per group demapper, so the LLRs can differ
+        # from it by rounding (around 1e-16) but not enough to change decodes
+        obs = obs.astype(np.complex128)
+        s = obs[rows[:, 0, np.newaxis], tones[:, 0]]
+        for symbol in range(1, num_symbols + 1):
+            s += obs[rows[:, symbol, np.newaxis], tones[:, symbol]]
+        
+        # Calculate magnitude of all the sums
+        m = np.abs(s)
+        
+        # Loop through the bit positions of a symbol group, doing all the groups together
+        # The last group may extend past the end of the codeword so the extra bits are dropped afterwards
+        group_llr = np.empty((len(rows), num_bits)) # Storage for Log likelyhood ratios of each group
+        for bit in range(num_bits):
+            # Find maximum magnitude of permutations where this bit position is a 1 and subtract maximum
+            # magnitude of permutations where this bit position is a 0
+            # The most significant bit of the permutations index corresponds with the first bit in the group
+            # Reshaping puts permutations where this bit is a 0 in the first half of the middle axis
+            m_max = np.reshape(m, (len(rows), -1, 2, 1 << (num_bits - 1 - bit))).max(axis=1).max(axis=2)
+            np.subtract(m_max[:, 1], m_max[:, 0], out=group_llr[:, bit])
+        llr = group_llr.reshape(-1)[:encoded_bits]
                           
         # Normalise using standard deviation and scale result with a WSJT-X fudge factor                 
         llr /= np.std(llr)
@@ -1487,129 +1709,424 @@ class Signal:
                                                      
         return llr
     
+    @staticmethod
+    def _decoder_result(codeword, llr, iterations, bad_bits):
+        """Package the result of decoding one frame as returned by the decoders."""
+        
+        # Bit LLRs that are not finite give a meaningless codeword that can still pass
+        # the parity checks and CRC, such as all zeros from NaN LLRs
+        msg = None
+        if bad_bits == 0 and np.isfinite(llr).all():
+            # Valid codeword so convert codeword to Python integer
+            bits = int.from_bytes(np.packbits(codeword[:91]).tobytes(), 'big') >> 5
+
+            # Try to unpack bits into a message - this also checks CRC
+            # The decoder has converged so we are done whether or not the CRC is good
+            # A good CRC can still hold an unsupported message type or invalid fields
+            try:
+                msg = Message.unpack91(bits)
+            except (Message.MessageError, ValueError):
+                pass # Bad CRC or message that cannot be unpacked so no message
+        
+        # Return decoded message (if any), codeword, iteration count and number of bad bits
+        return msg, codeword.copy(), iterations, int(bad_bits)
+
+    @staticmethod
+    def _finish_frames(results, active, codeword, llr, bad_bits, reliability, best_reliability, best_i, i):
+        """Record the results of the frames being decoded together that have finished.
+        
+        Frames finish when they have a valid codeword, when the reliability of their bit LLRs
+        has stalled or is not finite or on the last iteration. Returns a mask of the rows of storage of frames
+        that are still running or None if no frames finished.
+        """
+        
+        # Give up if the total magnitude of the bit LLRs has stopped growing as the decoder is not converging
+        # Waiting a number of iterations rather than stopping at the first fall avoids losing slow decodes
+        best_i[reliability > best_reliability] = i
+        np.fmax(best_reliability, reliability, out=best_reliability)
+        finished = (bad_bits == 0) | (best_i <= i - Signal.decoder_stall_iterations) | ~np.isfinite(reliability)
+        if i == Signal.decoder_max_iterations - 1:
+            finished[:] = True
+        if not finished.any():
+            return None
+        
+        for row in np.flatnonzero(finished):
+            results[active[row]] = Signal._decoder_result(codeword[row, 1:], llr[row], i, bad_bits[row])
+        return ~finished
+    
+    @staticmethod
+    def _drop_frames(running, frame_arrays, work_arrays):
+        """Drop the rows of finished frames from the storage of frames being decoded together.
+        
+        Frame arrays hold state carried from one iteration to the next, so their rows are selected.
+        Work arrays are rewritten every iteration apart from fixed padding, so they are just shortened.
+        """
+        
+        frames = np.count_nonzero(running)
+        return [a[running] for a in frame_arrays], [a[:frames] for a in work_arrays]
+
     @staticmethod
     def _sum_product_decoder(demapper_llr):
-        """Attempt to find valid LDPC codeword from LLR."""
+        """Attempt to find valid LDPC codeword from LLR.
+        
+        A 2D array of LLRs with one frame in each row decodes the frames together
+        and returns a list with the result for each frame.
+        """
+        
+        if demapper_llr.ndim == 1:
+            return Signal._sum_product_decoder(demapper_llr[np.newaxis])[0]
         
         # Sort of based on code from WSJT-X lib/ft8/bpdecode174_91.f90
         # Lots of optimisation was need to make it run well in Python
+        # Frames are decoded together so each numpy call does the work of every frame. The rows of
+        # frames that have finished are dropped, so each row of storage may belong to a different
+        # frame as decoding progresses
 
         # Allocate storage - This is an iterative algorithm so we want reuse memory where possible
-        codeword = np.empty(encoded_bits + 1, np.bool) # Current estimate of codeword
-        codeword[0] = False
-        bit_llr = np.empty(encoded_bits) # Current estimate of LLR for each bit
-        bit_in = np.zeros((encoded_bits, 3)) # Messages received by bit nodes
-        bit_out = np.zeros((encoded_bits + 1, 3)) # Messages sent by bit nodes
-        bit_out[0] = 1
-        check_in = np.ones((ldpc_parity_bits ,7)) # Messages received by check nodes
-        check_out = np.empty((ldpc_parity_bits, 7)) # Messages sent by check nodes
-        selector = 1 - np.identity(7) # Matrix of all 1 except diagonal which contains zeros
-        
-        msg = None
+        # Messages received by bit nodes are kept as arctanh of the check node product, which is -1/2
+        # of the LLR they contribute, and bit LLRs are kept halved, so no scaling is needed each iteration
+        # Single precision is plenty for the messages and halves the memory traffic of each iteration
+        frames = demapper_llr.shape[0]
+        codeword = np.empty((frames, encoded_bits + 1), bool) # Current estimate of codeword
+        codeword[:, 0] = False
+        check_bits = np.empty((frames,) + adjusted_check_terms.shape, bool) # Codeword bits in each parity check equation
+        half_demapper_llr = (0.5 * demapper_llr).astype(np.float32) # Half of the detector LLR for each bit
+        half_llr = np.empty((frames, encoded_bits), np.float32) # Half of current estimate of LLR for each bit
+        bit_in = np.zeros((frames, encoded_bits, 3), np.float32) # Messages received by bit nodes
+        bit_new = np.empty((frames, encoded_bits, 3), np.float32) # Messages received by bit nodes before damping
+        damping = Signal.decoder_damping
+        arctanh_limit = np.nextafter(np.float32(1), np.float32(0)) # Largest single precision value below 1
+        bit_out = np.zeros((frames, encoded_bits + 1, 3), np.float32) # Messages sent by bit nodes
+        bit_out[:, 0] = -1 # See below
+        check_in = np.ones((frames, ldpc_parity_bits, 7), np.float32) # Messages received by check nodes
+        check_out = np.empty((frames, ldpc_parity_bits, 7), np.float32) # Messages sent by check nodes
+        check_prefix = np.ones((frames, ldpc_parity_bits, 7), np.float32) # Product of messages before each check node term
+        check_suffix = np.ones((frames, ldpc_parity_bits, 7), np.float32) # Product of messages after each check node term
+        
+        results = [None] * frames
+        active = np.arange(frames) # Frame being decoded in each row of storage
+        best_reliability = np.zeros(frames, np.float32)
+        best_i = np.zeros(frames, int)
 
         for i in range(Signal.decoder_max_iterations):
         
             # Calculate current estimate of bit LLRs
             # On first iteration bit_in is zero so the estimated LLR equals the detector LLR
-            bit_llr[:] = demapper_llr + np.sum(bit_in, axis=1)
+            np.sum(bit_in, axis=2, out=half_llr)
+            np.subtract(half_demapper_llr, half_llr, out=half_llr)
             
             # Check if we have valid codeword after applying the hard decision rule
-            codeword[1:] = bit_llr > 0
-            bad_bits = np.sum(np.sum(np.take(codeword, adjusted_check_terms), axis=1) % 2)
-            if bad_bits == 0:
-                # Valid codeword so convert codeword to Python integer
-                bits = 0
-                for bit in codeword[1:92]:
-                    bits <<= 1
-                    bits |= int(bit)
-
-                # Try to unpack bits into a message - this also checks CRC
-                try:
-                    msg = Message.unpack91(bits)                
-                    break # Good CRC so we are done
-                except CRCError:
-                    pass # Bad CRC so keep iterating
+            # With only 83 short parity checks this is dominated by numpy call overhead, so packing
+            # the codeword into 64 bit words and counting bits is no faster than gathering bools
+            np.greater(half_llr, 0, out=codeword[:, 1:])
+            np.take(codeword, adjusted_check_terms, axis=1, out=check_bits)
+            bad_bits = np.logical_xor.reduce(check_bits, axis=2).sum(axis=1)
+            
+            # Drop frames that have finished
+            # Frames with a valid codeword are done as iterating further only drives the
+            # messages towards +/-1 where arctanh overflows
+            reliability = np.abs(half_llr).sum(axis=1)
+            running = Signal._finish_frames(results, active, codeword, half_llr, bad_bits, reliability,
+                                            best_reliability, best_i, i)
+            if running is not None:
+                frame_arrays, work_arrays = Signal._drop_frames(
+                    running, (active, half_demapper_llr, half_llr, bit_in, best_reliability, best_i),
+                    (codeword, check_bits, bit_new, bit_out, check_in, check_out, check_prefix, check_suffix))
+                active, half_demapper_llr, half_llr, bit_in, best_reliability, best_i = frame_arrays
+                codeword, check_bits, bit_new, bit_out, check_in, check_out, check_prefix, check_suffix = work_arrays
+                if active.size == 0:
+                    break
         
             # Calculate messages to send to check nodes at bit nodes
             # We send the current bit LLR estimate excluding contribution we got from the check node
             # Cheat by doing tanh before messages are sent instead of after they are received
-            bit_out[1:] = np.tanh(-0.5 * (bit_llr[:, np.newaxis] - bit_in))
+            # The messages should be tanh(-(bit_in + half_llr)) but we leave out the negation
+            np.add(bit_in, half_llr[:, :, np.newaxis], out=bit_out[:, 1:])
+            np.tanh(bit_out[:, 1:], out=bit_out[:, 1:])
         
-            # Send 522 messages from bit nodes to check nodes
-            np.take(bit_out.flat, adjusted_check_flat_terms, out=check_in)
+            # Send 522 messages from bit nodes to check nodes of each frame
+            # Flat views of each frame are used with the flat forms of the parity equations
+            np.take(bit_out.reshape(active.size, -1), adjusted_check_flat_terms, axis=1, out=check_in)
         
             # Calculate messages to send to bit nodes at check nodes
-            np.prod(np.where(selector, check_in[:,np.newaxis,:], 1.0), axis=2, out=check_out)
+            # Each message is the product of the messages received before and after the destination bit node
+            # A check node with d terms multiplies d - 1 messages so leaving out the negation of the messages
+            # flips the sign of the product when d is even. Parity check equations are padded to an odd
+            # number of terms with -1 so the padding flips the sign back when d is even.
+            np.cumprod(check_in[:, :, :-1], axis=2, out=check_prefix[:, :, 1:])
+            np.cumprod(check_in[:, :, :0:-1], axis=2, out=check_suffix[:, :, -2::-1])
+            np.multiply(check_prefix, check_suffix, out=check_out)
         
-            # Send 522 messages from check nodes to bit nodes
-            np.take(check_out.flat, bit_flat_terms, out=bit_in) 
+            # Send 522 messages from check nodes to bit nodes of each frame
+            np.take(check_out.reshape(active.size, -1), bit_flat_terms, axis=1, out=bit_new) 
         
             # Cheat by doing arctanh after messages are received instead of before they are sent
-            bit_in[:] = -2.0 * np.arctanh(bit_in)
+            # In single precision tanh reaches +/-1 for inputs above about 9, so the products are kept
+            # just inside +/-1 to stop arctanh returning infinity and the messages becoming NaN
+            np.clip(bit_new, -arctanh_limit, arctanh_limit, out=bit_new)
+            np.arctanh(bit_new, out=bit_new)
+            
+            # Optionally damp the messages by mixing in the messages from the previous iteration
+            if damping == 1.0:
+                bit_in, bit_new = bit_new, bit_in
+            else:
+                bit_new -= bit_in
+                bit_new *= damping
+                bit_in += bit_new
         
-        # Return decoded message (if any), codeword, iteration count and number of bad bits
-        return msg, codeword[1:], i, bad_bits
+        return results
 
     @staticmethod
-    def _get_snr(obs, codeword, freq, analysis):
-        """Calculate SNR for a successfully decoded message."""
+    def _min_sum_decoder(demapper_llr):
+        """Attempt to find valid LDPC codeword from LLR using the min-sum algorithm.
         
-        # Based on code from WSJT-X lib/ft8/ft8b.f90
+        A 2D array of LLRs with one frame in each row decodes the frames together
+        and returns a list with the result for each frame.
+        """
         
-        # Convert the codeword into symbols
-        msg_symbols = []
-        s = 0
-        for i, bit in enumerate(codeword):
-            s <<= 1
-            s = s | bit
-            if (i % 3) == 2:
-                msg_symbols.append(s)
-                s = 0
-        symbols = costas + msg_symbols[:encoded_symbols // 2] + costas + msg_symbols[encoded_symbols // 2:] + costas
+        if demapper_llr.ndim == 1:
+            return Signal._min_sum_decoder(demapper_llr[np.newaxis])[0]
+
+        # A scaled approximation of the sum product algorithm that replaces the
+        # tanh/arctanh product at the check nodes with a sign and minimum magnitude
+
+        # Allocate storage - Uses the same layout as the sum product decoder
+        frames = demapper_llr.shape[0]
+        codeword = np.empty((frames, encoded_bits + 1), bool) # Current estimate of codeword
+        codeword[:, 0] = False
+        check_bits = np.empty((frames,) + adjusted_check_terms.shape, bool) # Codeword bits in each parity check equation
+        bit_llr = np.empty((frames, encoded_bits)) # Current estimate of LLR for each bit
+        bit_in = np.zeros((frames, encoded_bits, 3)) # Messages received by bit nodes
+        bit_out = np.zeros((frames, encoded_bits + 1, 3)) # Messages sent by bit nodes
+        bit_out[:, 0] = np.inf # Padding terms never change the sign or the minimum
+        check_in = np.empty((frames, ldpc_parity_bits, 7)) # Messages received by check nodes
+        check_out = np.empty((frames, ldpc_parity_bits, 7)) # Messages sent by check nodes
+        magnitude = np.empty((frames, ldpc_parity_bits, 7)) # Magnitude of messages received by check nodes
+        flip = np.empty((frames, ldpc_parity_bits, 7), bool) # Check node messages that must be negative
+        scale = np.array([-Signal.min_sum_scale, Signal.min_sum_scale]) # Scaled sign indexed by flip
+
+        results = [None] * frames
+        active = np.arange(frames) # Frame being decoded in each row of storage
+        best_reliability = np.zeros(frames)
+        best_i = np.zeros(frames, int)
+
+        for i in range(Signal.decoder_max_iterations):
+
+            # Calculate current estimate of bit LLRs
+            np.sum(bit_in, axis=2, out=bit_llr)
+            bit_llr += demapper_llr
+
+            # Check if we have valid codeword after applying the hard decision rule
+            np.greater(bit_llr, 0, out=codeword[:, 1:])
+            np.take(codeword, adjusted_check_terms, axis=1, out=check_bits)
+            bad_bits = np.logical_xor.reduce(check_bits, axis=2).sum(axis=1)
+
+            # Drop frames that have finished as for the sum product decoder
+            reliability = np.abs(bit_llr).sum(axis=1)
+            running = Signal._finish_frames(results, active, codeword, bit_llr, bad_bits, reliability,
+                                            best_reliability, best_i, i)
+            if running is not None:
+                frame_arrays, work_arrays = Signal._drop_frames(
+                    running, (active, demapper_llr, bit_llr, bit_in, best_reliability, best_i),
+                    (codeword, check_bits, bit_out, check_in, check_out, magnitude, flip))
+                active, demapper_llr, bit_llr, bit_in, best_reliability, best_i = frame_arrays
+                codeword, check_bits, bit_out, check_in, check_out, magnitude, flip = work_arrays
+                if active.size == 0:
+                    break
+
+            # Send 522 messages from bit nodes to check nodes excluding the contribution
+            # we got from each check node
+            # Messages are negated so a positive message means the bit is more likely to be zero
+            np.subtract(bit_in, bit_llr[:, :, np.newaxis], out=bit_out[:, 1:])
+            np.take(bit_out.reshape(active.size, -1), adjusted_check_flat_terms, axis=1, out=check_in)
+
+            # Find the smallest and second smallest magnitude received by each check node
+            np.abs(check_in, out=magnitude)
+            smallest = np.partition(magnitude, 1, axis=2)
+            min_1 = smallest[:, :, :1]
+            min_2 = smallest[:, :, 1:2]
+
+            # Each check node sends the smallest magnitude excluding the message from the
+            # destination bit node with the sign that makes the parity check equation even
+            np.less(check_in, 0, out=flip)
+            odd = np.logical_xor.reduce(flip, axis=2)
+            np.logical_xor(flip, odd[:, :, np.newaxis], out=flip)
+            np.copyto(check_out, min_1)
+            np.copyto(check_out, min_2, where=magnitude == min_1)
+            np.multiply(check_out, scale[flip.view(np.uint8)], out=check_out)
+
+            # Send 522 messages from check nodes to bit nodes
+            np.take(check_out.reshape(active.size, -1), bit_flat_terms, axis=1, out=bit_in)
+
+        return results
 
-        symbol_range = np.arange(total_symbols)
+    @staticmethod
+    def _get_snr(power, codewords, freqs, analysis):
+        """Calculate SNRs for successfully decoded messages.
+        
+        Takes the tone powers, codeword and frequency of each message stacked in arrays.
+        """
+        
+        # Based on code from WSJT-X lib/ft8/ft8b.f90
         
-        # Get observations corresponding to decoded symbol values and compute power
-        signal_pwr = np.sum(np.abs(obs[symbol_range, symbols]) ** 2.0)
+        # Convert the codewords into symbols
+        msg_symbols = np.dot(codewords.reshape(-1, encoded_symbols, tone_order), [4, 2, 1])
+        costas_symbols = np.broadcast_to(costas_array, (len(codewords), costas_order))
+        symbols = np.concatenate((costas_symbols, msg_symbols[:, :encoded_symbols // 2], costas_symbols,
+                                  msg_symbols[:, encoded_symbols // 2:], costas_symbols), axis=1)
+        
+        # Get power of the observations corresponding to decoded symbol values
+        signal_pwr = np.sum(power[np.arange(len(codewords))[:, np.newaxis], np.arange(total_symbols), symbols], axis=1)
         
         # Calculate SNR using noise baseline
-        noise_psd = analysis.noise_baseline(freq)
-        arg = signal_pwr / (noise_psd * 2500)
-        if arg > 0.1:
-            snr = max(10.0 * np.log10(arg) - 19, -24.0)
-        else:
-            snr = -24.0
+        snr = np.maximum(Signal._power_snr(signal_pwr, freqs, analysis), -24.0)
         
         return snr
+    
+    @staticmethod
+    def _power_snr(signal_pwr, freqs, analysis):
+        """Calculate SNRs from signal powers using the noise baseline."""
+        
+        # The ratio is clamped at 0.1 where the SNR is already well below the -24 dB floor
+        noise_psd = analysis.noise_baseline(freqs)
+        arg = signal_pwr / (noise_psd * 2500)
+        return 10.0 * np.log10(np.maximum(arg, 0.1)) - 19
 
     @staticmethod
     def _detect(baseband, freq, analysis):
         
-        # Get channel observations from baseband signal
-        obs = Signal._demodulate(baseband)
+        # Detect the message as a batch of one signal
+        detection = Signal._detect_batch([baseband], [freq], analysis)[0]
+        
+        # Could not decode valid message
+        if detection is None:
+            raise ValueError()
+        
+        return detection
+    
+    @staticmethod
+    def _detect_batch(basebands, freqs, analysis):
+        """Detect the messages in a list of baseband signals, decoding the signals together.
+        
+        Returns a list with the detected message, SNR, observations, LLR and codeword
+        of each signal, or None for signals where no message was detected.
+        """
+        
+        detections = [None] * len(basebands)
+        
+        # Get channel observations from baseband signals
+        obs = []
+        demodulated = [] # Signals with observations
+        for k, baseband in enumerate(basebands):
+            try:
+                obs.append(Signal._demodulate(baseband))
+            except ValueError:
+                continue
+            demodulated.append(k)
+        if not demodulated:
+            return detections
+        obs = np.array(obs)
+        freqs = np.asarray(freqs)[demodulated]
+        power = _sq_mag(obs) # Power of each tone of each symbol, shared by both SNR calculations
+        
+        # Give up without decoding if even the strongest tone of every symbol is too weak to decode
+        # This overestimates the signal power of any message so only candidates that could not report
+        # an SNR above the threshold are skipped
+        quick_snr = Signal._power_snr(np.sum(np.max(power, axis=2), axis=1), freqs, analysis)
+        pending = np.flatnonzero(quick_snr >= Signal.detect_min_snr).tolist() # Rows of signals still to be decoded
+        decoded = [] # Rows, messages, LLRs and codewords of decoded signals
         
         # Demap and decode
+        # The demapper and decoders are looked up once rather than on every attempt
+        demap = Signal._demap
+        min_sum_decoder = Signal._min_sum_decoder
+        sum_product_decoder = Signal._sum_product_decoder
         for i in range(Signal.demap_max_symbols):
+            if not pending:
+                break
             
             # Demap using i symbols at a time
-            llr = Signal._demap(obs, i)
+            llr = np.array([demap(obs[row], i) for row in pending])
             
-            # Try and decode using sum product algorithm
-            msg, codeword, iterations, bad_bits = Signal._sum_product_decoder(llr)
+            # Try and decode using the min-sum algorithm, which usually needs fewer iterations,
+            # then fall back to the sum product algorithm
+            # All the signals still to be decoded are passed to the decoders together
+            results = min_sum_decoder(llr)
+            retry = [row for row, (msg, codeword, iterations, bad_bits) in enumerate(results) if msg is None]
+            if retry:
+                for row, result in zip(retry, sum_product_decoder(llr[retry])):
+                    results[row] = result
             
-            # Check for successful decode
-            if msg != None:
-                break
+            # Check for successful decodes
+            failed = []
+            for row, signal_llr, (msg, codeword, iterations, bad_bits) in zip(pending, llr, results):
+                if msg is None:
+                    failed.append(row)
+                else:
+                    decoded.append((row, msg, signal_llr, codeword))
+            pending = failed
                 
             # Put a priori stuff here
         
-        # Could not decode valid message
-        if msg == None:
-            raise ValueError()
+        if not decoded:
+            return detections
         
-        # Calculate SNR from noise baseline
-        snr = Signal._get_snr(obs, codeword, freq, analysis)
-        #snr = 1
+        # Calculate SNR from noise baseline for all the decoded signals at once
+        rows, msgs, llrs, codewords = zip(*decoded)
+        rows = list(rows)
+        snrs = Signal._get_snr(power[rows], np.array(codewords), freqs[rows], analysis)
+        for row, msg, snr, signal_llr, codeword in zip(rows, msgs, snrs.tolist(), llrs, codewords):
+            detections[demodulated[row]] = (msg, snr, obs[row], signal_llr, codeword)
         
-        return msg, snr, obs, llr, codeword
-    
\ No newline at end of file
+        return detections
+    
+# Number of candidates decode_all sends to a worker process at a time
+decode_batch_size = 16
+
+# Analysis used by decode_all worker processes, set once when each worker starts
+_worker_analysis = None
+
+def _init_decode_worker(analysis, calls):
+    global _worker_analysis
+    _worker_analysis = analysis
+    
+    # Workers started with spawn or forkserver import this module afresh with empty callsign tables
+    for call in calls:
+        if call not in Callsign.all_calls:
+            Callsign(call)
+
+def _decode_candidates(candidates):
+    return Signal.decode_batch(candidates, _worker_analysis)
+
+def decode_all(analysis, candidates=None, max_workers=None):
+    """Decode candidate signals in parallel using a pool of worker processes.
+    
+    Returns a list of Signal objects for the candidates that were decoded, in candidate order.
+    Candidates default to the candidate list of the analysis and max_workers defaults to the
+    number of processors.
+    
+    Each worker decodes with its own Callsign hash tables, built from the callsigns known
+    when decode_all was called, so a hashed callsign can only be resolved if it was known
+    then. Callsigns in the decoded messages are added to the hash tables of this process
+    afterwards.
+    """
+    
+    import concurrent.futures
+
+    if candidates is None:
+        candidates = analysis.candidate_list
+
+    # The analysis and known callsigns are sent to each worker once rather than with every candidate
+    # Each worker decodes batches of candidates together
+    batches = [candidates[i:i + decode_batch_size] for i in range(0, len(candidates), decode_batch_size)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers, initializer=_init_decode_worker,
+                                                initargs=(analysis, list(Callsign.all_calls))) as executor:
+        signals = [s for batch in executor.map(_decode_candidates, batches) for s in batch]
+
+    # Update callsign tables with callsigns decoded by the workers
+    for s in signals:
+        for value in vars(s.msg).values():
+            if isinstance(value, Callsign) and not value.isToken() and value.call not in Callsign.all_calls:
+                Callsign(value.call)
+
+    return signals